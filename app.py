@@ -10,11 +10,16 @@ from integrales import (
     integral_triple_numerica,
     compare_2d,
     compare_3d,
+    LazyExact,
+    format_exact_approx,
 )
 
 app = Flask(__name__)
 app.secret_key = "LLAVESUPERSECRETA"
 
+# Tiempo máximo (s) para la carrera de estrategias en integrales triples exactas.
+EXACT_RACE_TIMEOUT = 30.0
+
 
 @app.route("/", methods=["GET", "POST"])
 def index():
@@ -32,6 +37,9 @@ def index():
         "az": "0",
         "bz": "1",
         "n": "120",
+        "strategy": "fixed",
+        "precision": "",
+        "exact_fmt": "text",
     }
 
     form = {**defaults, **(request.form.to_dict() if request.method == "POST" else {})}
@@ -49,6 +57,11 @@ def index():
             ax = float(form["ax"]); bx = float(form["bx"])
             ay = float(form["ay"]); by = float(form["by"])
             n = int(form.get("n", "120"))
+            strategy = form.get("strategy", "fixed")
+            exact_fmt = form.get("exact_fmt", "text")
+            precision = int(form["precision"]) if form.get("precision", "").strip() else None
+            if precision is not None and not (1 <= precision <= 1000):
+                raise ValueError("La precisión debe estar entre 1 y 1000 dígitos.")
 
             if dims == 2:
                 b2 = Bounds2D(ax=ax, bx=bx, ay=ay, by=by)
@@ -57,8 +70,8 @@ def index():
                     exact = integral_doble_exacta(func_expr, b2)
                     result = {
                         "title": "Integral doble exacta (SymPy)",
-                        "exact": str(exact),
-                        "exact_approx": str(exact.evalf()),
+                        "exact": LazyExact(exact, exact_fmt),
+                        "exact_approx": format_exact_approx(exact, precision),
                     }
                 elif mode == "numeric":
                     numeric = integral_doble_numerica(func_expr, b2, method=method, n=n)
@@ -67,18 +80,21 @@ def index():
                         "numeric": f"{numeric:.12g}",
                     }
                 else:
-                    result = {"title": "Comparación (exacta vs numérica)", **compare_2d(func_expr, b2, method=method, n=n)}
+                    result = {
+                        "title": "Comparación (exacta vs numérica)",
+                        **compare_2d(func_expr, b2, method=method, n=n, precision=precision, fmt=exact_fmt),
+                    }
 
             elif dims == 3:
                 az = float(form["az"]); bz = float(form["bz"])
                 b3 = Bounds3D(ax=ax, bx=bx, ay=ay, by=by, az=az, bz=bz)
 
                 if mode == "exact":
-                    exact = integral_triple_exacta(func_expr, b3)
+                    exact = integral_triple_exacta(func_expr, b3, strategy=strategy, timeout=EXACT_RACE_TIMEOUT)
                     result = {
                         "title": "Integral triple exacta (SymPy)",
-                        "exact": str(exact),
-                        "exact_approx": str(exact.evalf()),
+                        "exact": LazyExact(exact, exact_fmt),
+                        "exact_approx": format_exact_approx(exact, precision),
                     }
                 elif mode == "numeric":
                     numeric = integral_triple_numerica(func_expr, b3, method=method, n=n)
@@ -89,7 +105,11 @@ def index():
                 else:
                     if method == "grid" and n > 80:
                         flash("Tip: En 3D con método grid usa n<=80 para que no tarde mucho.", "info")
-                    result = {"title": "Comparación (exacta vs numérica)", **compare_3d(func_expr, b3, method=method, n=n)}
+                    result = {
+                        "title": "Comparación (exacta vs numérica)",
+                        **compare_3d(func_expr, b3, method=method, n=n, strategy=strategy,
+                                     precision=precision, fmt=exact_fmt, timeout=EXACT_RACE_TIMEOUT),
+                    }
             else:
                 raise ValueError("Dimensión inválida.")
 
@@ -1,15 +1,27 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Callable, Dict, Optional
+from functools import lru_cache
+from itertools import permutations
+from typing import Callable, Dict, List, Optional, Tuple
+import math
+import multiprocessing as mp
+import os
+import queue
 import re
+import threading
+import time
 
 import numpy as np
-from sympy import symbols, integrate, sympify
+from sympy import (
+    Ei, Integral, Mul, S, Symbol, expand, integrate, latex, preorder_traversal, separatevars, srepr, symbols, sympify,
+)
+from sympy import acos, asin, atan, cos, cosh, exp, log, sin, sinh, tan, tanh
 from sympy.core.sympify import SympifyError
 
 try:
     from scipy import integrate as spint
+    from scipy import special as spspecial
     SCIPY_OK = True
 except Exception:
     SCIPY_OK = False
@@ -116,10 +128,210 @@ def integral_doble_exacta(func_expr: str, b: Bounds2D):
     return integrate(integrate(expr, (x, b.ax, b.bx)), (y, b.ay, b.by))
 
 
-def integral_triple_exacta(func_expr: str, b: Bounds3D):
+def integral_triple_exacta(func_expr: str, b: Bounds3D, strategy: str = "fixed",
+                           timeout: Optional[float] = None):
+    """
+    strategy:
+    - "fixed": integra siempre en orden x, luego y, luego z.
+    - "race": lanza varias estrategias (órdenes de integración y
+      pre-simplificaciones) en procesos paralelos, a lo más una por CPU a la
+      vez, y se queda con la primera que termine. La estrategia ganadora se
+      recuerda por forma de la expresión, así que las siguientes peticiones
+      parecidas van directo a ella.
+      Solo cuenta como ganadora una estrategia que evalúe la integral por completo.
+    timeout: segundos máximos para la carrera (solo en "race").
+    """
     _validate_bounds_3d(b)
     expr = parse_and_validate_expr(func_expr, dims=3)
-    return integrate(integrate(integrate(expr, (x, b.ax, b.bx)), (y, b.ay, b.by)), (z, b.az, b.bz))
+
+    if strategy == "fixed":
+        return integrate(integrate(integrate(expr, (x, b.ax, b.bx)), (y, b.ay, b.by)), (z, b.az, b.bz))
+
+    if strategy == "race":
+        return _integral_triple_race(expr, b, timeout=timeout)
+
+    raise ValueError("Estrategia no válida. Usa 'fixed' o 'race'.")
+
+
+# ---------------- ESTRATEGIAS (carrera de órdenes de integración) ----------------
+# Una estrategia es (pre-simplificación, orden). El orden "zyx" significa
+# integrar primero en z, luego en y y al final en x.
+Strategy = Tuple[str, str]
+
+_PREPROCESOS = ("none", "expand", "separatevars")
+_ORDENES = tuple("".join(str(s) for s in p) for p in permutations((x, y, z)))
+
+# En orden de prioridad: si hay menos CPUs que estrategias, las primeras
+# corren antes (el orden fijo x, y, z y la separación de variables).
+DEFAULT_STRATEGIES: List[Strategy] = (
+    [("none", "xyz"), ("separatevars", "xyz"), ("expand", "xyz")]
+    + [("none", o) for o in _ORDENES if o != "xyz"]
+)
+
+_STRATEGY_CACHE_MAX = 256
+_strategy_cache: Dict[str, Strategy] = {}
+_strategy_lock = threading.Lock()
+
+# Cada carrera lanza un proceso por estrategia; este límite acota el total
+# de procesos cuando el servidor atiende varias peticiones a la vez.
+MAX_CONCURRENT_RACES = 2
+_race_slots = threading.BoundedSemaphore(MAX_CONCURRENT_RACES)
+
+# Fracción del timeout que se le da a la estrategia recordada antes de
+# olvidarla y correr la carrera con las demás.
+KNOWN_STRATEGY_SHARE = 0.5
+
+
+class _RaceTimeout(RuntimeError):
+    pass
+
+_MP_CTX = None
+
+
+def _expr_shape(expr) -> str:
+    """Clave de caché: la estructura de la expresión sin sus constantes numéricas."""
+    c = Symbol("c")
+    return srepr(expr.replace(lambda e: e.is_Number, lambda e: c))
+
+
+def _run_strategy(expr, b: Bounds3D, strat: Strategy):
+    pre, order = strat
+    lims = {x: (b.ax, b.bx), y: (b.ay, b.by), z: (b.az, b.bz)}
+
+    if pre == "separatevars":
+        # Si f(x,y,z) = c*g(x)*h(y)*k(z), la triple se vuelve producto de tres integrales simples.
+        parts = separatevars(expr, symbols=[x, y, z], dict=True)
+        if parts is not None:
+            factors = [parts["coeff"]]
+            for s in (x, y, z):
+                factors.append(integrate(parts[s], (s, *lims[s])))
+            return Mul(*factors)
+        expr = separatevars(expr)
+    elif pre == "expand":
+        expr = expand(expr)
+
+    res = expr
+    for name in order:
+        s = symbols(name)
+        res = integrate(res, (s, *lims[s]))
+    return res
+
+
+def _strategy_worker(idx: int, expr, b: Bounds3D, strat: Strategy, out) -> None:
+    try:
+        value = _run_strategy(expr, b, strat)
+    except Exception as e:
+        out.put((idx, False, str(e)))
+        return
+    # integrate devuelve un Integral sin evaluar (o nan) cuando se rinde, y eso
+    # suele ser lo más rápido: no cuenta como victoria.
+    out.put((idx, not value.has(Integral, S.NaN), value))
+
+
+def _mp_context():
+    # Hacer fork desde el servidor Flask (multihilo) puede dejar locks tomados en el hijo.
+    global _MP_CTX
+    if _MP_CTX is None:
+        if "forkserver" in mp.get_all_start_methods():
+            _MP_CTX = mp.get_context("forkserver")
+            _MP_CTX.set_forkserver_preload([__name__])
+        else:
+            _MP_CTX = mp.get_context("spawn")
+    return _MP_CTX
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def _race(expr, b: Bounds3D, strategies: List[Strategy], deadline: Optional[float]):
+    """
+    Corre las estrategias en procesos, como mucho una por CPU a la vez y en
+    orden de prioridad, y devuelve (índice, valor, errores).
+    Si ninguna evalúa por completo, índice es None y valor es el primer
+    Integral sin evaluar (o None si todas fallaron).
+    """
+    if not _race_slots.acquire(timeout=_remaining(deadline)):
+        raise _RaceTimeout("Hay demasiadas integrales exactas en curso. Intenta de nuevo en un momento.")
+    try:
+        ctx = _mp_context()
+        out = ctx.Queue()
+        procs = []
+
+        def launch() -> None:
+            i = len(procs)
+            p = ctx.Process(target=_strategy_worker, args=(i, expr, b, strategies[i], out), daemon=True)
+            p.start()
+            procs.append(p)
+
+        for _ in range(min(len(strategies), os.cpu_count() or 1)):
+            launch()
+
+        partial = None
+        errors: List[str] = []
+        finished = 0
+        try:
+            while finished < len(procs):
+                try:
+                    idx, ok, value = out.get(timeout=_remaining(deadline))
+                except queue.Empty:
+                    raise _RaceTimeout("Ninguna estrategia terminó a tiempo. Intenta con un método numérico.")
+                finished += 1
+                if ok:
+                    return idx, value, errors
+                if isinstance(value, str):
+                    errors.append(value)
+                elif partial is None:
+                    partial = value
+                if len(procs) < len(strategies):
+                    launch()
+        finally:
+            # Cancela las estrategias que siguen corriendo.
+            for p in procs:
+                if p.is_alive():
+                    p.terminate()
+            for p in procs:
+                p.join()
+            out.close()
+        return None, partial, errors
+    finally:
+        _race_slots.release()
+
+
+def _integral_triple_race(expr, b: Bounds3D, strategies: Optional[List[Strategy]] = None,
+                          timeout: Optional[float] = None):
+    deadline = None if timeout is None else time.monotonic() + timeout
+    key = _expr_shape(expr)
+    with _strategy_lock:
+        known = _strategy_cache.get(key)
+
+    if known is not None:
+        # La estrategia recordada solo usa parte del tiempo; el resto queda para la carrera.
+        known_deadline = None if timeout is None else time.monotonic() + timeout * KNOWN_STRATEGY_SHARE
+        try:
+            idx, value, _ = _race(expr, b, [known], known_deadline)
+        except _RaceTimeout:
+            idx = None
+        if idx is not None:
+            return value
+        # La estrategia recordada ya no sirve para esta expresión: se olvida y se corre la carrera.
+        with _strategy_lock:
+            if _strategy_cache.get(key) == known:
+                del _strategy_cache[key]
+
+    strategies = [st for st in (strategies or DEFAULT_STRATEGIES) if st != known]
+    idx, value, errors = _race(expr, b, strategies, deadline)
+    if idx is not None:
+        with _strategy_lock:
+            if len(_strategy_cache) >= _STRATEGY_CACHE_MAX:
+                _strategy_cache.pop(next(iter(_strategy_cache)))
+            _strategy_cache[key] = strategies[idx]
+        return value
+
+    if value is not None:
+        # Igual que el orden fijo: si nadie evalúa, se devuelve el Integral sin evaluar.
+        return value
+    raise RuntimeError(f"Todas las estrategias fallaron: {errors[0] if errors else 'sin detalle'}")
 
 
 # ---------------- NUMÉRICAS ----------------
@@ -204,21 +416,161 @@ def integral_triple_numerica(func_expr: str, b: Bounds3D, method: str = "scipy",
     raise ValueError("Método numérico no válido. Usa 'scipy' o 'grid'.")
 
 
+# ---------------- FORMATO DE RESULTADOS EXACTOS ----------------
+# Algunos resultados simbólicos (ej. de exp(x*y)*sin(z)) son enormes: convertirlos a
+# texto es caro e infla el HTML. Por encima de estos límites se muestra un resumen.
+MAX_EXACT_NODES = 400
+MAX_EXACT_CHARS = 2000
+
+# Hasta esta precisión (dígitos) basta con float; arriba se usa evalf (mpmath).
+FLOAT_DIGITS = 15
+
+
+def _count_nodes(expr, limit: int) -> int:
+    """Cuenta nodos del árbol de la expresión, deteniéndose al pasar 'limit'."""
+    count = 0
+    for _ in preorder_traversal(expr):
+        count += 1
+        if count > limit:
+            break
+    return count
+
+
+@lru_cache(maxsize=256)
+def format_exact(exact, fmt: str = "text", max_nodes: int = MAX_EXACT_NODES,
+                 max_chars: int = MAX_EXACT_CHARS) -> str:
+    """
+    Representación acotada del resultado exacto.
+    fmt: "text" (str de SymPy) o "latex".
+    Si la expresión es demasiado grande ni siquiera se convierte a texto.
+    """
+    if fmt not in ("text", "latex"):
+        raise ValueError("Formato no válido. Usa 'text' o 'latex'.")
+
+    nodes = _count_nodes(exact, max_nodes)
+    if nodes > max_nodes:
+        head = type(exact).__name__
+        return f"[Expresión muy grande: {head} con {len(exact.args)} términos y más de {max_nodes} nodos]"
+
+    out = latex(exact) if fmt == "latex" else str(exact)
+    if len(out) > max_chars:
+        out = out[:max_chars] + f"… [{len(out) - max_chars} caracteres omitidos]"
+    return out
+
+
+class LazyExact:
+    """
+    Resultado exacto que se convierte a texto (con format_exact) solo cuando
+    se muestra: str(), la plantilla de Jinja o json.dumps(default=str).
+    """
+
+    __slots__ = ("expr", "fmt")
+
+    def __init__(self, expr, fmt: str = "text"):
+        if fmt not in ("text", "latex"):
+            raise ValueError("Formato no válido. Usa 'text' o 'latex'.")
+        self.expr = expr
+        self.fmt = fmt
+
+    def __str__(self) -> str:
+        return format_exact(self.expr, self.fmt)
+
+    def __repr__(self) -> str:
+        return f"LazyExact({type(self.expr).__name__}, fmt={self.fmt!r})"
+
+
+class _NoFloat(Exception):
+    """La expresión no se puede evaluar con floats de forma confiable."""
+
+
+_FLOAT_FUNCS = {
+    sin: math.sin, cos: math.cos, tan: math.tan,
+    asin: math.asin, acos: math.acos, atan: math.atan,
+    sinh: math.sinh, cosh: math.cosh, tanh: math.tanh,
+    exp: math.exp, log: math.log,
+}
+if SCIPY_OK:
+    _FLOAT_FUNCS[Ei] = spspecial.expi
+
+_FLOAT_CONSTS = {S.Pi: math.pi, S.Exp1: math.e, S.EulerGamma: 0.5772156649015329}
+
+
+def _float_eval(e) -> float:
+    """
+    Evalúa el árbol directamente con math (sin generar código ni usar mpmath).
+    Lanza _NoFloat ante algo no soportado o una cancelación fuerte en una suma,
+    donde el float perdería dígitos y hace falta evalf.
+    """
+    if e.is_Number:
+        return float(e)
+    if e in _FLOAT_CONSTS:
+        return _FLOAT_CONSTS[e]
+    if e.is_Add:
+        terms = [_float_eval(a) for a in e.args]
+        total = math.fsum(terms)
+        if abs(total) < 1e-9 * max(abs(t) for t in terms):
+            raise _NoFloat()
+        return total
+    if e.is_Mul:
+        return math.prod(_float_eval(a) for a in e.args)
+    if e.is_Pow:
+        return math.pow(_float_eval(e.base), _float_eval(e.exp))
+    f = _FLOAT_FUNCS.get(e.func)
+    if f is None or len(e.args) != 1:
+        raise _NoFloat()
+    return float(f(_float_eval(e.args[0])))
+
+
+@lru_cache(maxsize=256)
+def exact_to_float(exact) -> Optional[float]:
+    """
+    Valor float del resultado exacto, o None si no es real.
+    Si la expresión solo tiene funciones elementales (y Ei) se evalúa con math;
+    si no, evalf a 15 dígitos.
+    """
+    try:
+        val = _float_eval(exact)
+        if math.isfinite(val):
+            return val
+    except (_NoFloat, ValueError, OverflowError, ZeroDivisionError, TypeError):
+        pass
+    try:
+        return float(exact.evalf(FLOAT_DIGITS))
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=256)
+def format_exact_approx(exact, precision: Optional[int] = None) -> str:
+    """
+    Aproximación decimal del resultado exacto con 'precision' dígitos
+    significativos (12 si no se indica). Hasta 15 dígitos basta con float;
+    si se pide más, evalf con esos dígitos (mpmath).
+    """
+    if precision is None or precision <= FLOAT_DIGITS:
+        val = exact_to_float(exact)
+        if val is not None:
+            return f"{val:.{precision or 12}g}"
+
+    # Más de 15 dígitos, o un valor que no es float (ej. complejo): se muestra evalf.
+    try:
+        return str(exact.evalf(max(precision or FLOAT_DIGITS, 1)))
+    except Exception:
+        return "No convertible a número"
+
+
 # ---------------- COMPARACIÓN ----------------
-def compare_2d(func_expr: str, b: Bounds2D, method: str = "scipy", n: int = 120) -> Dict[str, str]:
+def compare_2d(func_expr: str, b: Bounds2D, method: str = "scipy", n: int = 120,
+               precision: Optional[int] = None, fmt: str = "text") -> Dict[str, object]:
     exact = integral_doble_exacta(func_expr, b)
     numeric = integral_doble_numerica(func_expr, b, method=method, n=n)
 
-    exact_float: Optional[float]
-    try:
-        exact_float = float(exact.evalf())
-    except Exception:
-        exact_float = None
+    exact_float = exact_to_float(exact)
 
     if exact_float is None:
         return {
-            "exact": str(exact),
-            "exact_approx": "No convertible a float",
+            "exact": LazyExact(exact, fmt),
+            "exact_approx": format_exact_approx(exact, precision),
             "numeric": f"{numeric:.12g}",
             "abs_error": "N/A",
             "rel_error": "N/A",
@@ -228,28 +580,26 @@ def compare_2d(func_expr: str, b: Bounds2D, method: str = "scipy", n: int = 120)
     rel_err = abs_err / (abs(exact_float) + 1e-12)
 
     return {
-        "exact": str(exact),
-        "exact_approx": f"{exact_float:.12g}",
+        "exact": LazyExact(exact, fmt),
+        "exact_approx": format_exact_approx(exact, precision),
         "numeric": f"{numeric:.12g}",
         "abs_error": f"{abs_err:.12g}",
         "rel_error": f"{rel_err:.12g}",
     }
 
 
-def compare_3d(func_expr: str, b: Bounds3D, method: str = "scipy", n: int = 60) -> Dict[str, str]:
-    exact = integral_triple_exacta(func_expr, b)
+def compare_3d(func_expr: str, b: Bounds3D, method: str = "scipy", n: int = 60,
+               strategy: str = "fixed", precision: Optional[int] = None, fmt: str = "text",
+               timeout: Optional[float] = None) -> Dict[str, object]:
+    exact = integral_triple_exacta(func_expr, b, strategy=strategy, timeout=timeout)
     numeric = integral_triple_numerica(func_expr, b, method=method, n=n)
 
-    exact_float: Optional[float]
-    try:
-        exact_float = float(exact.evalf())
-    except Exception:
-        exact_float = None
+    exact_float = exact_to_float(exact)
 
     if exact_float is None:
         return {
-            "exact": str(exact),
-            "exact_approx": "No convertible a float",
+            "exact": LazyExact(exact, fmt),
+            "exact_approx": format_exact_approx(exact, precision),
             "numeric": f"{numeric:.12g}",
             "abs_error": "N/A",
             "rel_error": "N/A",
@@ -259,8 +609,8 @@ def compare_3d(func_expr: str, b: Bounds3D, method: str = "scipy", n: int = 60)
     rel_err = abs_err / (abs(exact_float) + 1e-12)
 
     return {
-        "exact": str(exact),
-        "exact_approx": f"{exact_float:.12g}",
+        "exact": LazyExact(exact, fmt),
+        "exact_approx": format_exact_approx(exact, precision),
         "numeric": f"{numeric:.12g}",
         "abs_error": f"{abs_err:.12g}",
         "rel_error": f"{rel_err:.12g}",
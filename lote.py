@@ -0,0 +1,340 @@
+"""
+Ejecución por lotes de integrales desde la línea de comandos.
+
+Lee trabajos de un archivo CSV/JSONL (o de stdin), los reparte en un pool
+de procesos con un número acotado de trabajos en vuelo y escribe cada
+resultado como una línea JSON (NDJSON) en cuanto termina.
+
+Uso:
+    python lote.py trabajos.jsonl -o resultados.ndjson
+    python lote.py trabajos.csv --workers 4 --timeout 20 --unordered
+    cat trabajos.jsonl | python lote.py - --checkpoint hechos.txt
+
+Cada trabajo tiene los mismos campos que el formulario web:
+    id, dims, mode, method, n, func_expr, ax, bx, ay, by, az, bz,
+    strategy, precision, exact_fmt
+Solo func_expr es obligatorio; si falta id se usa "line:<número de línea>",
+así no choca con los id que pone el usuario.
+
+Con --checkpoint se guardan los id terminados; al relanzar con el mismo
+archivo esos trabajos se saltan, así que una corrida interrumpida se
+puede reanudar. Al final se imprime un resumen en JSON por stderr.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, Optional, Set, TextIO, Tuple
+
+from integrales import (
+    Bounds2D,
+    Bounds3D,
+    compare_2d,
+    compare_3d,
+    LazyExact,
+    format_exact_approx,
+    integral_doble_exacta,
+    integral_doble_numerica,
+    integral_triple_exacta,
+    integral_triple_numerica,
+)
+
+JOB_DEFAULTS = {
+    "dims": "2",
+    "mode": "compare",
+    "method": "scipy",
+    "ax": "0",
+    "bx": "1",
+    "ay": "0",
+    "by": "1",
+    "az": "0",
+    "bz": "1",
+    "strategy": "fixed",
+    "precision": "",
+    "exact_fmt": "text",
+}
+
+
+class JobTimeout(BaseException):
+    """
+    Hereda de BaseException para que los 'except Exception' de integrales.py
+    no la traguen y la conviertan en un resultado incorrecto.
+    """
+
+
+# ---------------- LECTURA DE TRABAJOS ----------------
+def read_jobs(stream: TextIO, fmt: str) -> Iterator[Tuple[str, Dict]]:
+    """
+    Genera (id, trabajo) sin cargar todo el archivo en memoria.
+    Las líneas inválidas se devuelven con la clave "_error" y un id "line:<n>".
+    """
+    if fmt == "csv":
+        for lineno, row in enumerate(csv.DictReader(stream), start=2):
+            job = {k: v for k, v in row.items() if v not in (None, "")}
+            yield str(job.get("id", f"line:{lineno}")), job
+        return
+
+    for lineno, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict):
+                raise ValueError("cada línea debe ser un objeto JSON")
+        except ValueError as e:
+            yield f"line:{lineno}", {"_error": f"Línea {lineno} inválida: {e}"}
+            continue
+        yield str(job.get("id", f"line:{lineno}")), job
+
+
+def _detect_format(path: str) -> str:
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def load_checkpoint(path: Optional[str]) -> Set[str]:
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as fh:
+        return {line.strip() for line in fh if line.strip()}
+
+
+# ---------------- EJECUCIÓN ----------------
+def _on_alarm(signum, frame):
+    raise JobTimeout()
+
+
+def _compute(job: Dict) -> Dict[str, object]:
+    j = {**JOB_DEFAULTS, **{k: str(v) for k, v in job.items() if v is not None}}
+    if "func_expr" not in j:
+        raise ValueError("Falta el campo 'func_expr'.")
+
+    dims = int(j["dims"])
+    mode = j["mode"]
+    method = j["method"]
+    func_expr = j["func_expr"]
+    exact_fmt = j["exact_fmt"]
+    precision = int(j["precision"]) if j["precision"].strip() else None
+    ax = float(j["ax"]); bx = float(j["bx"])
+    ay = float(j["ay"]); by = float(j["by"])
+
+    if dims == 2:
+        n = int(j.get("n", "120"))
+        b2 = Bounds2D(ax=ax, bx=bx, ay=ay, by=by)
+        if mode == "exact":
+            exact = integral_doble_exacta(func_expr, b2)
+            return {"exact": LazyExact(exact, exact_fmt), "exact_approx": format_exact_approx(exact, precision)}
+        if mode == "numeric":
+            return {"numeric": f"{integral_doble_numerica(func_expr, b2, method=method, n=n):.12g}"}
+        return compare_2d(func_expr, b2, method=method, n=n, precision=precision, fmt=exact_fmt)
+
+    if dims == 3:
+        n = int(j.get("n", "60"))
+        az = float(j["az"]); bz = float(j["bz"])
+        b3 = Bounds3D(ax=ax, bx=bx, ay=ay, by=by, az=az, bz=bz)
+        if mode == "exact":
+            exact = integral_triple_exacta(func_expr, b3, strategy=j["strategy"])
+            return {"exact": LazyExact(exact, exact_fmt), "exact_approx": format_exact_approx(exact, precision)}
+        if mode == "numeric":
+            return {"numeric": f"{integral_triple_numerica(func_expr, b3, method=method, n=n):.12g}"}
+        return compare_3d(func_expr, b3, method=method, n=n, strategy=j["strategy"],
+                          precision=precision, fmt=exact_fmt)
+
+    raise ValueError("Dimensión inválida.")
+
+
+def run_job(job_id: str, job: Dict, timeout: Optional[float]) -> Dict:
+    """Corre en el proceso del pool. El timeout usa SIGALRM donde existe (Unix)."""
+    use_alarm = bool(timeout) and hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    t0 = time.perf_counter()
+    try:
+        # El texto de LazyExact se genera aquí, en el proceso del pool.
+        result = {k: str(v) for k, v in _compute(job).items()}
+        record = {"id": job_id, "ok": True, "result": result}
+    except JobTimeout:
+        record = {"id": job_id, "ok": False, "error": f"Tiempo agotado ({timeout} s)", "timeout": True}
+    except Exception as e:
+        record = {"id": job_id, "ok": False, "error": str(e)}
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    record["elapsed_s"] = round(time.perf_counter() - t0, 6)
+    return record
+
+
+def _run_isolated(job_id: str, job: Dict, timeout: Optional[float]) -> Dict:
+    """Reintenta un trabajo solo, en un proceso nuevo, después de que murió el pool."""
+    with ProcessPoolExecutor(max_workers=1) as solo:
+        try:
+            return solo.submit(run_job, job_id, job, timeout).result()
+        except BrokenProcessPool:
+            # Este trabajo mató también al proceso nuevo: es él quien lo causa.
+            # No se marca en el checkpoint para que se reintente al reanudar.
+            return {"id": job_id, "ok": False, "error": "El proceso falló: BrokenProcessPool",
+                    "crashed": True, "elapsed_s": None}
+
+
+# ---------------- SALIDA ----------------
+class Writer:
+    """Escribe NDJSON, en orden de entrada o según terminan, y mantiene el checkpoint."""
+
+    def __init__(self, out: TextIO, ordered: bool, checkpoint: Optional[TextIO]):
+        self.out = out
+        self.ordered = ordered
+        self.checkpoint = checkpoint
+        self.pending: Dict[int, Dict] = {}
+        self.next_seq = 0
+        self.emitted = 0
+        self.stats = {"ok": 0, "failed": 0, "timeouts": 0, "crashed": 0}
+
+    def add(self, seq: int, record: Dict) -> None:
+        if not self.ordered:
+            self._emit(record)
+            return
+        self.pending[seq] = record
+        while self.next_seq in self.pending:
+            self._emit(self.pending.pop(self.next_seq))
+            self.next_seq += 1
+
+    def _emit(self, record: Dict) -> None:
+        self.out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.out.flush()
+        self.emitted += 1
+        if record["ok"]:
+            self.stats["ok"] += 1
+        else:
+            self.stats["failed"] += 1
+            if record.get("timeout"):
+                self.stats["timeouts"] += 1
+            if record.get("crashed"):
+                self.stats["crashed"] += 1
+        if self.checkpoint is not None:
+            # No se marcan como hechos los que fallaron por timeout o porque
+            # murió el proceso, para que al reanudar se vuelvan a intentar.
+            if not (record.get("timeout") or record.get("crashed")):
+                self.checkpoint.write(record["id"] + "\n")
+                self.checkpoint.flush()
+
+
+def run_batch(jobs: Iterator[Tuple[str, Dict]], writer: Writer, workers: int, max_inflight: int,
+              timeout: Optional[float], done: Set[str]) -> Dict:
+    t0 = time.monotonic()
+    skipped = 0
+    seq = 0
+    futures = {}
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+
+    def drain() -> None:
+        nonlocal pool
+        finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for fut in finished:
+            s, job_id, job, fut_pool = futures.pop(fut)
+            try:
+                record = fut.result()
+            except BrokenProcessPool:
+                # Murió un proceso del pool (OOM, segfault en código nativo...) y con él
+                # fallan todos los trabajos en vuelo. Se crea otro pool enseguida y cada
+                # afectado se reintenta solo, para no culpar a los que no lo causaron.
+                if fut_pool is pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = ProcessPoolExecutor(max_workers=workers)
+                record = _run_isolated(job_id, job, timeout)
+            except Exception as e:
+                record = {"id": job_id, "ok": False, "error": str(e), "elapsed_s": None}
+            writer.add(s, record)
+
+    try:
+        for job_id, job in jobs:
+            if job_id in done:
+                skipped += 1
+                continue
+
+            # En modo ordenado los resultados en espera también cuentan como
+            # trabajo en vuelo; así el buffer no crece sin límite.
+            while seq - writer.emitted >= max_inflight and futures:
+                drain()
+
+            if "_error" in job:
+                writer.add(seq, {"id": job_id, "ok": False, "error": job["_error"], "elapsed_s": 0.0})
+            else:
+                try:
+                    fut = pool.submit(run_job, job_id, job, timeout)
+                except BrokenProcessPool:
+                    # Un proceso murió y el pool quedó inservible: se crea otro.
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = ProcessPoolExecutor(max_workers=workers)
+                    fut = pool.submit(run_job, job_id, job, timeout)
+                futures[fut] = (seq, job_id, job, pool)
+            seq += 1
+
+        while futures:
+            drain()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+    elapsed = time.monotonic() - t0
+    return {
+        "jobs": seq,
+        "skipped": skipped,
+        **writer.stats,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_jobs_s": round(seq / elapsed, 3) if elapsed > 0 else 0.0,
+    }
+
+
+# ---------------- CLI ----------------
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Calcula integrales por lotes (CSV/JSONL -> NDJSON).")
+    ap.add_argument("input", nargs="?", default="-", help="Archivo de trabajos o '-' para stdin.")
+    ap.add_argument("-o", "--output", default="-", help="Archivo NDJSON de salida (por defecto stdout).")
+    ap.add_argument("--format", choices=("auto", "csv", "jsonl"), default="auto")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--max-inflight", type=int, help="Máximo de trabajos en vuelo (por defecto 2*workers).")
+    ap.add_argument("--timeout", type=float, help="Timeout por trabajo en segundos.")
+    ap.add_argument("--unordered", action="store_true", help="Escribe resultados según terminan.")
+    ap.add_argument("--checkpoint", help="Archivo con los id terminados, para reanudar.")
+    args = ap.parse_args(argv)
+
+    if args.workers < 1:
+        ap.error("--workers debe ser >= 1.")
+    max_inflight = args.max_inflight or 2 * args.workers
+    if max_inflight < 1:
+        ap.error("--max-inflight debe ser >= 1.")
+
+    fmt = args.format
+    if fmt == "auto":
+        fmt = "jsonl" if args.input == "-" else _detect_format(args.input)
+
+    done = load_checkpoint(args.checkpoint)
+    src = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+    # Al reanudar se agrega a la salida existente en lugar de sobrescribirla.
+    out_mode = "a" if done else "w"
+    out = sys.stdout if args.output == "-" else open(args.output, out_mode, encoding="utf-8")
+    ckpt = open(args.checkpoint, "a", encoding="utf-8") if args.checkpoint else None
+
+    try:
+        writer = Writer(out, ordered=not args.unordered, checkpoint=ckpt)
+        summary = run_batch(read_jobs(src, fmt), writer, args.workers, max_inflight, args.timeout, done)
+    finally:
+        for fh in (src, out, ckpt):
+            if fh is not None and fh not in (sys.stdin, sys.stdout):
+                fh.close()
+
+    print(json.dumps(summary, ensure_ascii=False), file=sys.stderr)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+Prueba de carga para la app Flask de app.py.
+
+Levanta el servidor en un proceso aparte (o usa uno ya corriendo con --url),
+lanza N clientes concurrentes que repiten una mezcla configurable de
+peticiones POST / y reporta en JSON: throughput, latencias p50/p95/p99,
+tasa de errores y el punto de saturación al subir la concurrencia.
+
+Uso:
+    python prueba_carga.py --clients 1,2,4,8 --duration 10
+    python prueba_carga.py --mix mezcla.json --out reporte.json
+    python prueba_carga.py --url http://127.0.0.1:5000/ --clients 4
+
+La mezcla (--mix) es un JSON que, por campo, asigna a cada valor su peso, por ejemplo:
+    {
+      "dims":   {"2": 0.7, "3": 0.3},
+      "mode":   {"compare": 0.5, "exact": 0.2, "numeric": 0.3},
+      "method": {"scipy": 0.8, "grid": 0.2},
+      "n":      {"40": 0.5, "120": 0.5},
+      "func_expr": {"x*y": 0.6, "exp(x*y)*sin(z)": 0.4}
+    }
+Las funciones con z solo se usan en peticiones de dimensión 3.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MIX: Dict[str, Dict[str, float]] = {
+    "dims": {"2": 0.6, "3": 0.4},
+    "mode": {"compare": 0.5, "exact": 0.2, "numeric": 0.3},
+    "method": {"scipy": 0.8, "grid": 0.2},
+    "n": {"30": 0.5, "60": 0.5},
+    "func_expr": {
+        "x*y": 0.4,
+        "x^2 + y^2": 0.2,
+        "sin(x)*cos(y)": 0.2,
+        "x*y*z": 0.1,
+        "exp(x*y)*sin(z)": 0.1,
+    },
+}
+
+BOUNDS = {"ax": "0", "bx": "1", "ay": "0", "by": "2", "az": "0", "bz": "1"}
+
+
+# ---------------- MEZCLA DE PETICIONES ----------------
+def _pick(rng: random.Random, weights: Dict[str, float]) -> str:
+    keys = list(weights)
+    return rng.choices(keys, weights=[weights[k] for k in keys])[0]
+
+
+def make_payload(rng: random.Random, mix: Dict[str, Dict[str, float]]) -> Dict[str, str]:
+    dims = _pick(rng, mix["dims"])
+    funcs = mix["func_expr"]
+    if dims == "2":
+        # Las funciones con z no son válidas en integrales dobles.
+        funcs = {f: w for f, w in funcs.items() if "z" not in f} or {"x*y": 1.0}
+    payload = {
+        "dims": dims,
+        "mode": _pick(rng, mix["mode"]),
+        "method": _pick(rng, mix["method"]),
+        "n": _pick(rng, mix["n"]),
+        "func_expr": _pick(rng, funcs),
+        **BOUNDS,
+    }
+    if "strategy" in mix:
+        payload["strategy"] = _pick(rng, mix["strategy"])
+    return payload
+
+
+def payload_class(p: Dict[str, str]) -> str:
+    """Clase de la petición para ver qué tipo bloquea a cuál (head-of-line)."""
+    return f"{p['dims']}d/{p['mode']}"
+
+
+# ---------------- SERVIDOR LOCAL ----------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(threaded: bool = True, timeout: float = 30.0):
+    port = _free_port()
+    cmd = [sys.executable, "-m", "flask", "--app", "app", "run", "--port", str(port)]
+    cmd.append("--with-threads" if threaded else "--without-threads")
+    proc = subprocess.Popen(cmd, cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("El servidor Flask terminó antes de aceptar conexiones.")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return proc, f"http://127.0.0.1:{port}/"
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("El servidor Flask no respondió a tiempo.")
+
+
+# ---------------- CLIENTES ----------------
+def _send(url: str, payload: Dict[str, str], timeout: float):
+    data = urllib.parse.urlencode(payload).encode()
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, data=data, timeout=timeout) as resp:
+            body = resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        return time.perf_counter() - t0, False, f"HTTP {e.code}"
+    except Exception as e:
+        return time.perf_counter() - t0, False, type(e).__name__
+    elapsed = time.perf_counter() - t0
+
+    if status != 200:
+        return elapsed, False, f"HTTP {status}"
+    # index() responde 200 aunque falle el cálculo; el error viene como flash.
+    if b"alert--error" in body:
+        return elapsed, False, "flash error"
+    return elapsed, True, None
+
+
+def run_level(url: str, clients: int, duration: float, mix, seed: int, timeout: float) -> Dict:
+    samples: List[tuple] = []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(i: int) -> None:
+        rng = random.Random(seed + i)
+        local = []
+        while time.monotonic() < stop_at:
+            p = make_payload(rng, mix)
+            elapsed, ok, err = _send(url, p, timeout)
+            local.append((payload_class(p), elapsed, ok, err))
+        with lock:
+            samples.extend(local)
+
+    t0 = time.monotonic()
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.monotonic() - t0
+
+    return {"clients": clients, "wall_s": round(wall, 3), **summarize(samples, wall)}
+
+
+# ---------------- REPORTE ----------------
+def percentile(sorted_vals: List[float], q: float) -> Optional[float]:
+    if not sorted_vals:
+        return None
+    k = min(len(sorted_vals) - 1, max(0, int(round(q / 100 * (len(sorted_vals) - 1)))))
+    return sorted_vals[k]
+
+
+def _ms(v: Optional[float]) -> Optional[float]:
+    return None if v is None else round(v * 1000, 2)
+
+
+def _latency_stats(lat: List[float]) -> Dict[str, Optional[float]]:
+    lat = sorted(lat)
+    return {
+        "p50_ms": _ms(percentile(lat, 50)),
+        "p95_ms": _ms(percentile(lat, 95)),
+        "p99_ms": _ms(percentile(lat, 99)),
+        "max_ms": _ms(lat[-1] if lat else None),
+    }
+
+
+def summarize(samples: List[tuple], wall: float) -> Dict:
+    total = len(samples)
+    errors = [s for s in samples if not s[2]]
+    ok_lat = [s[1] for s in samples if s[2]]
+
+    error_kinds: Dict[str, int] = {}
+    for s in errors:
+        error_kinds[s[3]] = error_kinds.get(s[3], 0) + 1
+
+    # Las latencias, globales y por clase, son solo de peticiones exitosas;
+    # los errores se cuentan aparte.
+    by_class: Dict[str, Dict] = {}
+    for cls in sorted({s[0] for s in samples}):
+        in_cls = [s for s in samples if s[0] == cls]
+        lat = [s[1] for s in in_cls if s[2]]
+        by_class[cls] = {
+            "requests": len(in_cls),
+            "errors": len(in_cls) - len(lat),
+            **_latency_stats(lat),
+        }
+
+    return {
+        "requests": total,
+        "throughput_rps": round(len(ok_lat) / wall, 3) if wall > 0 else 0.0,
+        "error_rate": round(len(errors) / total, 4) if total else 0.0,
+        "errors": error_kinds,
+        "latency": _latency_stats(ok_lat),
+        "by_class": by_class,
+    }
+
+
+def find_saturation(levels: List[Dict], min_gain: float = 0.10) -> Optional[int]:
+    """
+    Primer nivel de concurrencia donde agregar clientes ya no mejora el
+    throughput al menos min_gain (10%) respecto al nivel anterior.
+    """
+    for prev, cur in zip(levels, levels[1:]):
+        if prev["throughput_rps"] <= 0:
+            continue
+        gain = (cur["throughput_rps"] - prev["throughput_rps"]) / prev["throughput_rps"]
+        if gain < min_gain:
+            return prev["clients"]
+    return None
+
+
+# ---------------- CLI ----------------
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Prueba de carga para la calculadora de integrales.")
+    ap.add_argument("--url", help="URL de un servidor ya corriendo. Si no se da, se levanta uno local.")
+    ap.add_argument("--clients", default="1,2,4,8", help="Niveles de concurrencia separados por coma.")
+    ap.add_argument("--duration", type=float, default=10.0, help="Segundos por nivel.")
+    ap.add_argument("--mix", help="Archivo JSON con la mezcla de peticiones.")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--timeout", type=float, default=60.0, help="Timeout por petición (s).")
+    ap.add_argument("--no-threads", action="store_true", help="Levanta el servidor sin hilos.")
+    ap.add_argument("--out", help="Archivo de salida JSON (por defecto stdout).")
+    args = ap.parse_args(argv)
+
+    mix = dict(DEFAULT_MIX)
+    if args.mix:
+        with open(args.mix, encoding="utf-8") as fh:
+            mix.update(json.load(fh))
+
+    levels = [int(c) for c in args.clients.split(",") if c.strip()]
+    if not levels or min(levels) < 1:
+        ap.error("--clients debe tener al menos un nivel >= 1.")
+
+    proc = None
+    url = args.url
+    if url is None:
+        proc, url = start_server(threaded=not args.no_threads)
+
+    try:
+        results = [run_level(url, c, args.duration, mix, args.seed, args.timeout) for c in levels]
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    report = {
+        "url": url,
+        "duration_per_level_s": args.duration,
+        "mix": mix,
+        "levels": results,
+        "saturation_clients": find_saturation(results),
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,13 @@
 (function () {
   const dimsSelect = document.getElementById("dimsSelect");
   const zRow = document.getElementById("zRow");
+  const strategyRow = document.getElementById("strategyRow");
   const btnReset = document.getElementById("btnReset");
 
   function syncUI() {
     const dims = dimsSelect?.value || "2";
     if (zRow) zRow.style.display = (dims === "3") ? "grid" : "none";
+    if (strategyRow) strategyRow.style.display = (dims === "3") ? "grid" : "none";
   }
 
   dimsSelect?.addEventListener("change", syncUI);